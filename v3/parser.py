@@ -1,621 +1,341 @@
+import functools
+import hashlib
 import json
+import logging
+import math
+import mmap
+import os
+import re
+import shutil
+import sys
+from array import array
 
-def parse_teapot_data(data_string):
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+log = logging.getLogger(__name__)
+
+# Matches the header of a surface definition and captures its six parameters:
+# u_degree, "u_knot_type", "u_basis", v_degree, "v_knot_type", "v_basis",
+SURFACE_RE = re.compile(rb'surface\(\s*(\d+)\s*,\s*"([^"]+)"\s*,\s*"([^"]+)"\s*,\s*(\d+)\s*,\s*"([^"]+)"\s*,\s*"([^"]+)"\s*,')
+
+# Every surface is a 4x4 grid of 3D points, i.e. 48 floats.
+FLOATS_PER_SURFACE = 4 * 4 * 3
+
+# Everything but parentheses and commas, deleted from a points array to get its
+# punctuation, which must match POINTS_SKELETON: 4 rows of 4 pt(x, y, z).
+NON_PUNCTUATION = bytes(set(range(256)) - set(b'(),'))
+POINTS_SKELETON = b','.join([b'(' + b','.join([b'(,,)'] * 4) + b')'] * 4)
+
+# Every surface of the teapot uses these parameters, so they are recognized
+# from the raw SURFACE_RE groups without converting each value separately.
+STANDARD_PARAM_GROUPS = (b'4', b'ec_open', b'kv_bezier', b'4', b'ec_open', b'kv_bezier')
+STANDARD_PARAMS = {
+    "u_degree": 4,
+    "u_knot_type": "ec_open",
+    "u_basis": "kv_bezier",
+    "v_degree": 4,
+    "v_knot_type": "ec_open",
+    "v_basis": "kv_bezier"
+}
+
+def _match_paren(s, start=0, end=None, depth=1):
+    """
+    Returns the index of the parenthesis that closes an already opened group,
+    scanning from 'start' up to 'end'. Returns -1 if the group is not closed
+    before 'end'.
+
+    Uses find() to jump between parentheses instead of looping over every
+    character in Python.
+    """
+    open_idx = s.find(b'(', start, end)
+    close_idx = s.find(b')', start, end)
+    while close_idx != -1:
+        if open_idx != -1 and open_idx < close_idx:
+            depth += 1
+            open_idx = s.find(b'(', open_idx + 1, end)
+        else:
+            depth -= 1
+            if depth == 0:
+                return close_idx
+            close_idx = s.find(b')', close_idx + 1, end)
+    return -1
+
+def _report_error(data_string, match, message):
+    # The block is only sliced and decoded when the message will be emitted
+    if log.isEnabledFor(logging.WARNING):
+        block = data_string[match.end():match.end() + 200].decode('utf-8', 'replace')
+        log.warning("Error parsing surface block: %s... Error: %s", block, message)
+
+def _surface_blocks(data_string):
+    """
+    Yields every surface header match together with the index where its block
+    ends, i.e. the start of the next surface header or the end of the data.
+    """
+    # The pattern is compiled once at import, so the whole buffer is walked
+    # by the regex engine instead of being split into intermediate strings.
+    matches = SURFACE_RE.finditer(data_string)
+    match = next(matches, None)
+    while match is not None:
+        next_match = next(matches, None)
+        yield match, next_match.start() if next_match is not None else len(data_string)
+        match = next_match
+
+def _extract_coords(data_string, match, block_end):
+    """
+    Returns the 48 coordinate strings of the surface whose header is 'match',
+    or None (after reporting the error) if its points array is malformed.
+    """
+    # The points of a surface are the contents of the array( ... ) that
+    # follows its parameters, which must be found before the next surface.
+    array_idx = data_string.find(b'array(', match.end(), block_end)
+    if array_idx == -1:
+        _report_error(data_string, match, "Could not find 'array(' in surface block.")
+        return None
+
+    points_start = array_idx + len(b'array(')
+    points_end = _match_paren(data_string, points_start, block_end)
+    if points_end == -1:
+        _report_error(data_string, match, "Mismatched parentheses in points array.")
+        return None
+
+    # The punctuation of the array must be exactly 4 rows of 4 points with 3
+    # coordinates each, so a point with a missing or extra value is rejected.
+    block = data_string[points_start:points_end]
+    if block.count(b'pt(') != 16 or block.translate(None, NON_PUNCTUATION) != POINTS_SKELETON:
+        _report_error(data_string, match, "Expected 4 rows of 4 points with 3 coordinates each.")
+        return None
+
+    # Removing the pt( ... ) and array( ... ) wrappers leaves only the comma
+    # separated coordinates of the 16 points. Whitespace is kept, so fused or
+    # damaged numbers still fail in float(), which strips it around a value.
+    # float() accepts the resulting bytes directly, so nothing is decoded.
+    return block.replace(b'pt(', b'').replace(b'array(', b'').replace(b')', b'').split(b',')
+
+def _surface_params(match):
+    groups = match.groups()
+    if groups == STANDARD_PARAM_GROUPS:
+        return STANDARD_PARAMS.copy()
+
+    # The knot types and bases repeat on every surface ("ec_open", "kv_bezier"),
+    # so they are interned and all surfaces share the same string objects.
+    u_degree, u_knot_type, u_basis, v_degree, v_knot_type, v_basis = groups
+    return {
+        "u_degree": int(u_degree),
+        "u_knot_type": sys.intern(u_knot_type.decode('utf-8')),
+        "u_basis": sys.intern(u_basis.decode('utf-8')),
+        "v_degree": int(v_degree),
+        "v_knot_type": sys.intern(v_knot_type.decode('utf-8')),
+        "v_basis": sys.intern(v_basis.decode('utf-8'))
+    }
+
+def _convert_slow(data_string, matches, surface_params, coord_strs, typecode):
+    """
+    Converts the coordinates one surface at a time, dropping the surfaces
+    that contain a value which is not a valid number or which overflows
+    the chosen typecode.
+
+    Only used when converting all the coordinates at once has failed.
     """
-    Parses the raw Utah Teapot data string and converts it into a structured
-    Python dictionary, which can then be serialized to JSON.
+    control_points = array(typecode)
+    valid_params = []
+
+    for index, match in enumerate(matches):
+        coords = coord_strs[index * FLOATS_PER_SURFACE:(index + 1) * FLOATS_PER_SURFACE]
+        try:
+            values = [float(coord) for coord in coords]
+        except ValueError as e:
+            _report_error(data_string, match, e)
+            continue
+
+        converted = array(typecode, values)
+        if any(math.isinf(point) and not math.isinf(value) for point, value in zip(converted, values)):
+            _report_error(data_string, match, f"Coordinate out of range for typecode '{typecode}'.")
+            continue
+
+        control_points.extend(converted)
+        valid_params.append(surface_params[index])
+
+    return {
+        "surface_params": valid_params,
+        "control_points": control_points
+    }
+
+def parse_teapot_data(data_string, typecode='d'):
+    """
+    Parses the raw Utah Teapot data string into the surface parameters and
+    the control points of every surface.
 
     The format is based on the provided text, which defines an array of surfaces,
     where each surface contains a 4x4 grid of 3D control points (pt).
+
+    The data may be given as a str or as any bytes-like object supporting
+    find() and slicing (bytes, mmap); it is scanned as UTF-8 bytes.
+
+    Returns a dictionary with two keys:
+    - "surface_params": one dictionary per surface with its degrees and knot types.
+    - "control_points": a single flat array of floats laid out as
+      (surface, row, column, xyz), i.e. FLOATS_PER_SURFACE floats per surface.
+
+    'typecode' is the array type of the control points: 'd' (float64) by
+    default, or 'f' (float32) to halve their memory for consumers that do not
+    need double precision. The teapot coordinates have at most 6 significant
+    digits, so float32 represents them without visible loss. With 'f', surfaces
+    with a coordinate beyond the float32 range (about 3.4e38) are reported and
+    skipped. Any other typecode raises ValueError.
+
+    Results for str and bytes input are cached, so parsing the same data again
+    only copies the cached parameters and control points; callers can modify
+    the returned result without affecting later calls.
+
+    Use to_json() to convert the result into the "TeaSrfs" JSON format.
     """
-    surfaces = []
-    
-    # Split the data string by 'surface(' to get individual surface definitions.
-    # The first split will be empty or contain comments, so we skip it.
-    surface_blocks = data_string.split('surface(')[1:]
-
-    for block in surface_blocks:
-        # Each block starts with degree and knot information, then the array of points.
-        # We need to find the array part.
+    if typecode not in ('d', 'f'):
+        raise ValueError(f"typecode must be 'd' or 'f', not {typecode!r}")
+
+    if isinstance(data_string, (str, bytes)):
+        cached = _parse_cached(data_string, typecode)
+        return {
+            "surface_params": [params.copy() for params in cached["surface_params"]],
+            "control_points": array(typecode, cached["control_points"])
+        }
+    return _parse(data_string, typecode)
+
+@functools.lru_cache(maxsize=4)
+def _parse_cached(data_string, typecode):
+    return _parse(data_string, typecode)
+
+def _parse(data_string, typecode):
+    if isinstance(data_string, str):
+        data_string = data_string.encode('utf-8')
+
+    extracted = [
+        (match, _extract_coords(data_string, match, block_end))
+        for match, block_end in _surface_blocks(data_string)
+    ]
+    extracted = [(match, coords) for match, coords in extracted if coords is not None]
+
+    # The coordinate strings of the whole file are collected first and then
+    # converted in a single pass into one contiguous buffer.
+    matches = [match for match, _ in extracted]
+    surface_params = [_surface_params(match) for match in matches]
+    coord_strs = [coord for _, coords in extracted for coord in coords]
+
+    # Fast path: all the coordinates are converted at once, without guarding
+    # every surface with its own try block. Only if some value is not a valid
+    # number, or does not fit in a float32, the slow path converts surface by
+    # surface to drop the bad ones.
+    try:
+        control_points = array(typecode, map(float, coord_strs))
+    except ValueError:
+        return _convert_slow(data_string, matches, surface_params, coord_strs, typecode)
+
+    if typecode == 'f' and any(map(math.isinf, control_points)):
+        return _convert_slow(data_string, matches, surface_params, coord_strs, typecode)
+
+    return {
+        "surface_params": surface_params,
+        "control_points": control_points
+    }
+
+def _to_grid(flat, offset=0):
+    # Chunks the 48 floats of a surface into 4 rows of 4 [x, y, z] points
+    return [
+        [flat[point:point + 3] for point in range(row, row + 12, 3)]
+        for row in range(offset, offset + FLOATS_PER_SURFACE, 12)
+    ]
+
+def iter_surfaces(data_string):
+    """
+    Lazily parses the raw Utah Teapot data, yielding one surface at a time in
+    the "TeaSrfs" format: its parameters plus a 4x4 grid of [x, y, z] points.
+
+    Unlike parse_teapot_data(), nothing is built for surfaces the caller does
+    not consume, and only one surface is held in memory at a time. Malformed
+    surfaces are reported and skipped.
+    """
+    if isinstance(data_string, str):
+        data_string = data_string.encode('utf-8')
+
+    for match, block_end in _surface_blocks(data_string):
+        coords = _extract_coords(data_string, match, block_end)
+        if coords is None:
+            continue
+
         try:
-            # Extract parameters like degrees and knot types
-            # Example: 4, "ec_open", "kv_bezier", 4, "ec_open", "kv_bezier",
-            param_end_idx = block.find('array(')
-            if param_end_idx == -1:
-                raise ValueError("Could not find 'array(' in surface block.")
-
-            param_str = block[:param_end_idx].strip()
-            
-            # Simple regex-like parsing for parameters.
-            # Assuming format: u_degree, "u_knot_type", "u_basis", v_degree, "v_knot_type", "v_basis",
-            parts = [p.strip() for p in param_str.split(',')]
-            
-            u_degree = int(parts[0])
-            u_knot_type = parts[1].strip('"')
-            u_basis = parts[2].strip('"')
-            v_degree = int(parts[3])
-            v_knot_type = parts[4].strip('"')
-            v_basis = parts[5].strip('"')
-
-            # Extract the raw control points array string
-            points_array_str = block[param_end_idx + len('array('):]
-            # Find the matching closing parenthesis for the outermost array
-            open_paren_count = 1
-            close_paren_idx = -1
-            for i, char in enumerate(points_array_str):
-                if char == '(':
-                    open_paren_count += 1
-                elif char == ')':
-                    open_paren_count -= 1
-                if open_paren_count == 0:
-                    close_paren_idx = i
-                    break
-            
-            if close_paren_idx == -1:
-                raise ValueError("Mismatched parentheses in points array.")
-
-            points_array_str = points_array_str[:close_paren_idx].strip()
-
-            # Now parse the 4x4 array of points
-            control_points = []
-            # Split by 'array(' to get rows, then parse points in each row
-            row_blocks = points_array_str.split('array(')[1:]
-
-            for row_block in row_blocks:
-                current_row = []
-                # Split by 'pt(' to get individual points
-                point_strs = row_block.split('pt(')[1:]
-                for pt_str in point_strs:
-                    # Remove trailing ')' and split by ','
-                    coords_str = pt_str.split(')')[0].strip()
-                    x, y, z = map(float, coords_str.split(','))
-                    current_row.append([x, y, z])
-                control_points.append(current_row)
-            
-            surfaces.append({
-                "u_degree": u_degree,
-                "u_knot_type": u_knot_type,
-                "u_basis": u_basis,
-                "v_degree": v_degree,
-                "v_knot_type": v_knot_type,
-                "v_basis": v_basis,
-                "control_points": control_points
-            })
-
-        except Exception as e:
-            print(f"Error parsing surface block: {block[:200]}... Error: {e}")
+            flat = [float(coord) for coord in coords]
+        except ValueError as e:
+            _report_error(data_string, match, e)
             continue
 
-    return {"TeaSrfs": surfaces}
-
-# Example usage:
-# Assume 'teapot_raw_data' contains the entire string you provided in the prompt.
-# You would load this from a file in a real scenario.
-teapot_raw_data = """
-#
-# teapot: this is the original non-rational bezier teapot data. the data
-#         comes from Martin Newel and Jim Blinn.
-#
-# Thomas V Thompson II
-# January 28 2000
-#
-
-TeaSrfs: array(
-    surface( 4, "ec_open", "kv_bezier", 4, "ec_open", "kv_bezier",
-	array(
-	    array( pt( 1.4, 2.25, 0.0 ),
-                   pt( 1.3375, 2.38125, 0.0 ),
-                   pt( 1.4375, 2.38125, 0.0 ),
-                   pt( 1.5, 2.25, 0.0 ) ),
-	    array( pt( 1.4, 2.25, 0.784 ),
-                   pt( 1.3375, 2.38125, 0.749 ),
-                   pt( 1.4375, 2.38125, 0.805 ),
-                   pt( 1.5, 2.25, 0.84 ) ),
-	    array( pt( 0.784, 2.25, 1.4 ),
-                   pt( 0.749, 2.38125, 1.3375 ),
-                   pt( 0.805, 2.38125, 1.4375 ),
-                   pt( 0.84, 2.25, 1.5 ) ),
-	    array( pt( 0.0, 2.25, 1.4 ),
-                   pt( 0.0, 2.38125, 1.3375 ),
-                   pt( 0.0, 2.38125, 1.4375 ),
-                   pt( 0.0, 2.25, 1.5 ) ) ) ),
-    surface( 4, "ec_open", "kv_bezier", 4, "ec_open", "kv_bezier",
-	array(
-	    array( pt( 0.0, 2.25, 1.4 ),
-                   pt( 0.0, 2.38125, 1.3375 ),
-                   pt( 0.0, 2.38125, 1.4375 ),
-                   pt( 0.0, 2.25, 1.5 ) ),
-	    array( pt( -0.784, 2.25, 1.4 ),
-                   pt( -0.749, 2.38125, 1.3375 ),
-                   pt( -0.805, 2.38125, 1.4375 ),
-                   pt( -0.84, 2.25, 1.5 ) ),
-	    array( pt( -1.4, 2.25, 0.784 ),
-                   pt( -1.3375, 2.38125, 0.749 ),
-                   pt( -1.4375, 2.38125, 0.805 ),
-                   pt( -1.5, 2.25, 0.84 ) ),
-	    array( pt( -1.4, 2.25, 0.0 ),
-                   pt( -1.3375, 2.38125, 0.0 ),
-                   pt( -1.4375, 2.38125, 0.0 ),
-                   pt( -1.5, 2.25, 0.0 ) ) ) ),
-    surface( 4, "ec_open", "kv_bezier", 4, "ec_open", "kv_bezier",
-	array(
-	    array( pt( -1.4, 2.25, 0.0 ),
-                   pt( -1.3375, 2.38125, 0.0 ),
-                   pt( -1.4375, 2.38125, 0.0 ),
-                   pt( -1.5, 2.25, 0.0 ) ),
-	    array( pt( -1.4, 2.25, -0.784 ),
-                   pt( -1.3375, 2.38125, -0.749 ),
-                   pt( -1.4375, 2.38125, -0.805 ),
-                   pt( -1.5, 2.25, -0.84 ) ),
-	    array( pt( -0.784, 2.25, -1.4 ),
-                   pt( -0.749, 2.38125, -1.3375 ),
-                   pt( -0.805, 2.38125, -1.4375 ),
-                   pt( -0.84, 2.25, -1.5 ) ),
-	    array( pt( 0.0, 2.25, -1.4 ),
-                   pt( 0.0, 2.38125, -1.3375 ),
-                   pt( 0.0, 2.38125, -1.4375 ),
-                   pt( 0.0, 2.25, -1.5 ) ) ) ),
-    surface( 4, "ec_open", "kv_bezier", 4, "ec_open", "kv_bezier",
-	array(
-	    array( pt( 0.0, 2.25, -1.4 ),
-                   pt( 0.0, 2.38125, -1.3375 ),
-                   pt( 0.0, 2.38125, -1.4375 ),
-                   pt( 0.0, 2.25, -1.5 ) ),
-	    array( pt( 0.784, 2.25, -1.4 ),
-                   pt( 0.749, 2.38125, -1.3375 ),
-                   pt( 0.805, 2.38125, -1.4375 ),
-                   pt( 0.84, 2.25, -1.5 ) ),
-	    array( pt( 1.4, 2.25, -0.784 ),
-                   pt( 1.3375, 2.38125, -0.749 ),
-                   pt( 1.4375, 2.38125, -0.805 ),
-                   pt( 1.5, 2.25, -0.84 ) ),
-	    array( pt( 1.4, 2.25, 0.0 ),
-                   pt( 1.3375, 2.38125, 0.0 ),
-                   pt( 1.4375, 2.38125, 0.0 ),
-                   pt( 1.5, 2.25, 0.0 ) ) ) ),
-    surface( 4, "ec_open", "kv_bezier", 4, "ec_open", "kv_bezier",
-	array(
-	    array( pt( 1.5, 2.25, 0.0 ),
-                   pt( 1.75, 1.725, 0.0 ),
-                   pt( 2, 1.2, 0.0 ),
-                   pt( 2, 0.75, 0.0 ) ),
-	    array( pt( 1.5, 2.25, 0.84 ),
-                   pt( 1.75, 1.725, 0.98 ),
-                   pt( 2, 1.2, 1.12 ),
-                   pt( 2, 0.75, 1.12 ) ),
-	    array( pt( 0.84, 2.25, 1.5 ),
-                   pt( 0.98, 1.725, 1.75 ),
-                   pt( 1.12, 1.2, 2 ),
-                   pt( 1.12, 0.75, 2 ) ),
-	    array( pt( 0.0, 2.25, 1.5 ),
-                   pt( 0.0, 1.725, 1.75 ),
-                   pt( 0.0, 1.2, 2 ),
-                   pt( 0.0, 0.75, 2 ) ) ) ),
-    surface( 4, "ec_open", "kv_bezier", 4, "ec_open", "kv_bezier",
-	array(
-	    array( pt( 0.0, 2.25, 1.5 ),
-                   pt( 0.0, 1.725, 1.75 ),
-                   pt( 0.0, 1.2, 2 ),
-                   pt( 0.0, 0.75, 2 ) ),
-	    array( pt( -0.84, 2.25, 1.5 ),
-                   pt( -0.98, 1.725, 1.75 ),
-                   pt( -1.12, 1.2, 2 ),
-                   pt( -1.12, 0.75, 2 ) ),
-	    array( pt( -1.5, 2.25, 0.84 ),
-                   pt( -1.75, 1.725, 0.98 ),
-                   pt( -2, 1.2, 1.12 ),
-                   pt( -2, 0.75, 1.12 ) ),
-	    array( pt( -1.5, 2.25, 0.0 ),
-                   pt( -1.75, 1.725, 0.0 ),
-                   pt( -2, 1.2, 0.0 ),
-                   pt( -2, 0.75, 0.0 ) ) ) ),
-    surface( 4, "ec_open", "kv_bezier", 4, "ec_open", "kv_bezier",
-	array(
-	    array( pt( -1.5, 2.25, 0.0 ),
-                   pt( -1.75, 1.725, 0.0 ),
-                   pt( -2, 1.2, 0.0 ),
-                   pt( -2, 0.75, 0.0 ) ),
-	    array( pt( -1.5, 2.25, -0.84 ),
-                   pt( -1.75, 1.725, -0.98 ),
-                   pt( -2, 1.2, -1.12 ),
-                   pt( -2, 0.75, -1.12 ) ),
-	    array( pt( -0.84, 2.25, -1.5 ),
-                   pt( -0.98, 1.725, -1.75 ),
-                   pt( -1.12, 1.2, -2 ),
-                   pt( -1.12, 0.75, -2 ) ),
-	    array( pt( 0.0, 2.25, -1.5 ),
-                   pt( 0.0, 1.725, -1.75 ),
-                   pt( 0.0, 1.2, -2 ),
-                   pt( 0.0, 0.75, -2 ) ) ) ),
-    surface( 4, "ec_open", "kv_bezier", 4, "ec_open", "kv_bezier",
-	array(
-	    array( pt( 0.0, 2.25, -1.5 ),
-                   pt( 0.0, 1.725, -1.75 ),
-                   pt( 0.0, 1.2, -2 ),
-                   pt( 0.0, 0.75, -2 ) ),
-	    array( pt( 0.84, 2.25, -1.5 ),
-                   pt( 0.98, 1.725, -1.75 ),
-                   pt( 1.12, 1.2, -2 ),
-                   pt( 1.12, 0.75, -2 ) ),
-	    array( pt( 1.5, 2.25, -0.84 ),
-                   pt( 1.75, 1.725, -0.98 ),
-                   pt( 2, 1.2, -1.12 ),
-                   pt( 2, 0.75, -1.12 ) ),
-	    array( pt( 1.5, 2.25, 0.0 ),
-                   pt( 1.75, 1.725, 0.0 ),
-                   pt( 2, 1.2, 0.0 ),
-                   pt( 2, 0.75, 0.0 ) ) ) ),
-    surface( 4, "ec_open", "kv_bezier", 4, "ec_open", "kv_bezier",
-	array(
-	    array( pt( 2, 0.75, 0.0 ),
-                   pt( 2, 0.3, 0.0 ),
-                   pt( 1.5, 0.075, 0.0 ),
-                   pt( 1.5, 0.0, 0.0 ) ),
-	    array( pt( 2, 0.75, 1.12 ),
-                   pt( 2, 0.3, 1.12 ),
-                   pt( 1.5, 0.075, 0.84 ),
-                   pt( 1.5, 0.0, 0.84 ) ),
-	    array( pt( 1.12, 0.75, 2 ),
-                   pt( 1.12, 0.3, 2 ),
-                   pt( 0.84, 0.075, 1.5 ),
-                   pt( 0.84, 0.0, 1.5 ) ),
-	    array( pt( 0.0, 0.75, 2 ),
-                   pt( 0.0, 0.3, 2 ),
-                   pt( 0.0, 0.075, 1.5 ),
-                   pt( 0.0, 0.0, 1.5 ) ) ) ),
-    surface( 4, "ec_open", "kv_bezier", 4, "ec_open", "kv_bezier",
-	array(
-	    array( pt( 0.0, 0.75, 2 ),
-                   pt( 0.0, 0.3, 2 ),
-                   pt( 0.0, 0.075, 1.5 ),
-                   pt( 0.0, 0.0, 1.5 ) ),
-	    array( pt( -1.12, 0.75, 2 ),
-                   pt( -1.12, 0.3, 2 ),
-                   pt( -0.84, 0.075, 1.5 ),
-                   pt( -0.84, 0.0, 1.5 ) ),
-	    array( pt( -2, 0.75, 1.12 ),
-                   pt( -2, 0.3, 1.12 ),
-                   pt( -1.5, 0.075, 0.84 ),
-                   pt( -1.5, 0.0, 0.84 ) ),
-	    array( pt( -2, 0.75, 0.0 ),
-                   pt( -2, 0.3, 0.0 ),
-                   pt( -1.5, 0.075, 0.0 ),
-                   pt( -1.5, 0.0, 0.0 ) ) ) ),
-    surface( 4, "ec_open", "kv_bezier", 4, "ec_open", "kv_bezier",
-	array(
-	    array( pt( -2, 0.75, 0.0 ),
-                   pt( -2, 0.3, 0.0 ),
-                   pt( -1.5, 0.075, 0.0 ),
-                   pt( -1.5, 0.0, 0.0 ) ),
-	    array( pt( -2, 0.75, -1.12 ),
-                   pt( -2, 0.3, -1.12 ),
-                   pt( -1.5, 0.075, -0.84 ),
-                   pt( -1.5, 0.0, -0.84 ) ),
-	    array( pt( -1.12, 0.75, -2 ),
-                   pt( -1.12, 0.3, -2 ),
-                   pt( -0.84, 0.075, -1.5 ),
-                   pt( -0.84, 0.0, -1.5 ) ),
-	    array( pt( 0.0, 0.75, -2 ),
-                   pt( 0.0, 0.3, -2 ),
-                   pt( 0.0, 0.075, -1.5 ),
-                   pt( 0.0, 0.0, -1.5 ) ) ) ),
-    surface( 4, "ec_open", "kv_bezier", 4, "ec_open", "kv_bezier",
-	array(
-	    array( pt( 0.0, 0.75, -2 ),
-                   pt( 0.0, 0.3, -2 ),
-                   pt( 0.0, 0.075, -1.5 ),
-                   pt( 0.0, 0.0, -1.5 ) ),
-	    array( pt( 1.12, 0.75, -2 ),
-                   pt( 1.12, 0.3, -2 ),
-                   pt( 0.84, 0.075, -1.5 ),
-                   pt( 0.84, 0.0, -1.5 ) ),
-	    array( pt( 2, 0.75, -1.12 ),
-                   pt( 2, 0.3, -1.12 ),
-                   pt( 1.5, 0.075, -0.84 ),
-                   pt( 1.5, 0.0, -0.84 ) ),
-	    array( pt( 2, 0.75, 0.0 ),
-                   pt( 2, 0.3, 0.0 ),
-                   pt( 1.5, 0.075, 0.0 ),
-                   pt( 1.5, 0.0, 0.0 ) ) ) ),
-    surface( 4, "ec_open", "kv_bezier", 4, "ec_open", "kv_bezier",
-	array(
-	    array( pt( -1.6, 1.875, 0.0 ),
-                   pt( -2.3, 1.875, 0.0 ),
-                   pt( -2.7, 1.875, 0.0 ),
-                   pt( -2.7, 1.65, 0.0 ) ),
-	    array( pt( -1.6, 1.875, 0.3 ),
-                   pt( -2.3, 1.875, 0.3 ),
-                   pt( -2.7, 1.875, 0.3 ),
-                   pt( -2.7, 1.65, 0.3 ) ),
-	    array( pt( -1.5, 2.1, 0.3 ),
-                   pt( -2.5, 2.1, 0.3 ),
-                   pt( -3, 2.1, 0.3 ),
-                   pt( -3, 1.65, 0.3 ) ),
-	    array( pt( -1.5, 2.1, 0.0 ),
-                   pt( -2.5, 2.1, 0.0 ),
-                   pt( -3, 2.1, 0.0 ),
-                   pt( -3, 1.65, 0.0 ) ) ) ),
-    surface( 4, "ec_open", "kv_bezier", 4, "ec_open", "kv_bezier",
-	array(
-	    array( pt( -1.5, 2.1, 0.0 ),
-                   pt( -2.5, 2.1, 0.0 ),
-                   pt( -3, 2.1, 0.0 ),
-                   pt( -3, 1.65, 0.0 ) ),
-	    array( pt( -1.5, 2.1, -0.3 ),
-                   pt( -2.5, 2.1, -0.3 ),
-                   pt( -3, 2.1, -0.3 ),
-                   pt( -3, 1.65, -0.3 ) ),
-	    array( pt( -1.6, 1.875, -0.3 ),
-                   pt( -2.3, 1.875, -0.3 ),
-                   pt( -2.7, 1.875, -0.3 ),
-                   pt( -2.7, 1.65, -0.3 ) ),
-	    array( pt( -1.6, 1.875, 0.0 ),
-                   pt( -2.3, 1.875, 0.0 ),
-                   pt( -2.7, 1.875, 0.0 ),
-                   pt( -2.7, 1.65, 0.0 ) ) ) ),
-    surface( 4, "ec_open", "kv_bezier", 4, "ec_open", "kv_bezier",
-	array(
-	    array( pt( -2.7, 1.65, 0.0 ),
-                   pt( -2.7, 1.425, 0.0 ),
-                   pt( -2.5, 0.975, 0.0 ),
-                   pt( -2, 0.75, 0.0 ) ),
-	    array( pt( -2.7, 1.65, 0.3 ),
-                   pt( -2.7, 1.425, 0.3 ),
-                   pt( -2.5, 0.975, 0.3 ),
-                   pt( -2, 0.75, 0.3 ) ),
-	    array( pt( -3, 1.65, 0.3 ),
-                   pt( -3, 1.2, 0.3 ),
-                   pt( -2.65, 0.7875, 0.3 ),
-                   pt( -1.9, 0.45, 0.3 ) ),
-	    array( pt( -3, 1.65, 0.0 ),
-                   pt( -3, 1.2, 0.0 ),
-                   pt( -2.65, 0.7875, 0.0 ),
-                   pt( -1.9, 0.45, 0.0 ) ) ) ),
-    surface( 4, "ec_open", "kv_bezier", 4, "ec_open", "kv_bezier",
-	array(
-	    array( pt( -3, 1.65, 0.0 ),
-                   pt( -3, 1.2, 0.0 ),
-                   pt( -2.65, 0.7875, 0.0 ),
-                   pt( -1.9, 0.45, 0.0 ) ),
-	    array( pt( -3, 1.65, -0.3 ),
-                   pt( -3, 1.2, -0.3 ),
-                   pt( -2.65, 0.7875, -0.3 ),
-                   pt( -1.9, 0.45, -0.3 ) ),
-	    array( pt( -2.7, 1.65, -0.3 ),
-                   pt( -2.7, 1.425, -0.3 ),
-                   pt( -2.5, 0.975, -0.3 ),
-                   pt( -2, 0.75, -0.3 ) ),
-	    array( pt( -2.7, 1.65, 0.0 ),
-                   pt( -2.7, 1.425, 0.0 ),
-                   pt( -2.5, 0.975, 0.0 ),
-                   pt( -2, 0.75, 0.0 ) ) ) ),
-    surface( 4, "ec_open", "kv_bezier", 4, "ec_open", "kv_bezier",
-	array(
-	    array( pt( 1.7, 1.275, 0.0 ),
-                   pt( 2.6, 1.275, 0.0 ),
-                   pt( 2.3, 1.95, 0.0 ),
-                   pt( 2.7, 2.25, 0.0 ) ),
-	    array( pt( 1.7, 1.275, 0.66 ),
-                   pt( 2.6, 1.275, 0.66 ),
-                   pt( 2.3, 1.95, 0.25 ),
-                   pt( 2.7, 2.25, 0.25 ) ),
-	    array( pt( 1.7, 0.45, 0.66 ),
-                   pt( 3.1, 0.675, 0.66 ),
-                   pt( 2.4, 1.875, 0.25 ),
-                   pt( 3.3, 2.25, 0.25 ) ),
-	    array( pt( 1.7, 0.45, 0.0 ),
-                   pt( 3.1, 0.675, 0.0 ),
-                   pt( 2.4, 1.875, 0.0 ),
-                   pt( 3.3, 2.25, 0.0 ) ) ) ),
-    surface( 4, "ec_open", "kv_bezier", 4, "ec_open", "kv_bezier",
-	array(
-	    array( pt( 1.7, 0.45, 0.0 ),
-                   pt( 3.1, 0.675, 0.0 ),
-                   pt( 2.4, 1.875, 0.0 ),
-                   pt( 3.3, 2.25, 0.0 ) ),
-	    array( pt( 1.7, 0.45, -0.66 ),
-                   pt( 3.1, 0.675, -0.66 ),
-                   pt( 2.4, 1.875, -0.25 ),
-                   pt( 3.3, 2.25, -0.25 ) ),
-	    array( pt( 1.7, 1.275, -0.66 ),
-                   pt( 2.6, 1.275, -0.66 ),
-                   pt( 2.3, 1.95, -0.25 ),
-                   pt( 2.7, 2.25, -0.25 ) ),
-	    array( pt( 1.7, 1.275, 0.0 ),
-                   pt( 2.6, 1.275, 0.0 ),
-                   pt( 2.3, 1.95, 0.0 ),
-                   pt( 2.7, 2.25, 0.0 ) ) ) ),
-    surface( 4, "ec_open", "kv_bezier", 4, "ec_open", "kv_bezier",
-	array(
-	    array( pt( 2.7, 2.25, 0.0 ),
-                   pt( 2.8, 2.325, 0.0 ),
-                   pt( 2.9, 2.325, 0.0 ),
-                   pt( 2.8, 2.25, 0.0 ) ),
-	    array( pt( 2.7, 2.25, 0.25 ),
-                   pt( 2.8, 2.325, 0.25 ),
-                   pt( 2.9, 2.325, 0.15 ),
-                   pt( 2.8, 2.25, 0.15 ) ),
-	    array( pt( 3.3, 2.25, 0.25 ),
-                   pt( 3.525, 2.34375, 0.25 ),
-                   pt( 3.45, 2.3625, 0.15 ),
-                   pt( 3.2, 2.25, 0.15 ) ),
-	    array( pt( 3.3, 2.25, 0.0 ),
-                   pt( 3.525, 2.34375, 0.0 ),
-                   pt( 3.45, 2.3625, 0.0 ),
-                   pt( 3.2, 2.25, 0.0 ) ) ) ),
-    surface( 4, "ec_open", "kv_bezier", 4, "ec_open", "kv_bezier",
-	array(
-	    array( pt( 3.3, 2.25, 0.0 ),
-                   pt( 3.525, 2.34375, 0.0 ),
-                   pt( 3.45, 2.3625, 0.0 ),
-                   pt( 3.2, 2.25, 0.0 ) ),
-	    array( pt( 3.3, 2.25, -0.25 ),
-                   pt( 3.525, 2.34375, -0.25 ),
-                   pt( 3.45, 2.3625, -0.15 ),
-                   pt( 3.2, 2.25, -0.15 ) ),
-	    array( pt( 2.7, 2.25, -0.25 ),
-                   pt( 2.8, 2.325, -0.25 ),
-                   pt( 2.9, 2.325, -0.15 ),
-                   pt( 2.8, 2.25, -0.15 ) ),
-	    array( pt( 2.7, 2.25, 0.0 ),
-                   pt( 2.8, 2.325, 0.0 ),
-                   pt( 2.9, 2.325, 0.0 ),
-                   pt( 2.8, 2.25, 0.0 ) ) ) ),
-    surface( 4, "ec_open", "kv_bezier", 4, "ec_open", "kv_bezier",
-	array(
-	    array( pt( 0.01, 3, 0.0 ),
-                   pt( 0.8, 3, 0.0 ),
-                   pt( 0.0, 2.7, 0.0 ),
-                   pt( 0.2, 2.55, 0.0 ) ),
-	    array( pt( 0.0, 3, 0.01 ),
-                   pt( 0.8, 3, 0.45 ),
-                   pt( 0.0, 2.7, 0.0 ),
-                   pt( 0.2, 2.55, 0.112 ) ),
-	    array( pt( 0.01, 3, 0.0 ),
-                   pt( 0.45, 3, 0.8 ),
-                   pt( 0.0, 2.7, 0.0 ),
-                   pt( 0.112, 2.55, 0.2 ) ),
-	    array( pt( 0.0, 3, 0.01 ),
-                   pt( 0.0, 3, 0.8 ),
-                   pt( 0.0, 2.7, 0.0 ),
-                   pt( 0.0, 2.55, 0.2 ) ) ) ),
-    surface( 4, "ec_open", "kv_bezier", 4, "ec_open", "kv_bezier",
-	array(
-	    array( pt( 0.0, 3, 0.01 ),
-                   pt( 0.0, 3, 0.8 ),
-                   pt( 0.0, 2.7, 0.0 ),
-                   pt( 0.0, 2.55, 0.2 ) ),
-	    array( pt( -0.01, 3, 0.0 ),
-                   pt( -0.45, 3, 0.8 ),
-                   pt( 0.0, 2.7, 0.0 ),
-                   pt( -0.112, 2.55, 0.2 ) ),
-	    array( pt( 0.0, 3, 0.01 ),
-                   pt( -0.8, 3, 0.45 ),
-                   pt( 0.0, 2.7, 0.0 ),
-                   pt( -0.2, 2.55, 0.112 ) ),
-	    array( pt( -0.01, 3, 0.0 ),
-                   pt( -0.8, 3, 0.0 ),
-                   pt( 0.0, 2.7, 0.0 ),
-                   pt( -0.2, 2.55, 0.0 ) ) ) ),
-    surface( 4, "ec_open", "kv_bezier", 4, "ec_open", "kv_bezier",
-	array(
-	    array( pt( -0.01, 3, 0.0 ),
-                   pt( -0.8, 3, 0.0 ),
-                   pt( 0.0, 2.7, 0.0 ),
-                   pt( -0.2, 2.55, 0.0 ) ),
-	    array( pt( 0.0, 3, -0.01 ),
-                   pt( -0.8, 3, -0.45 ),
-                   pt( 0.0, 2.7, 0.0 ),
-                   pt( -0.2, 2.55, -0.112 ) ),
-	    array( pt( -0.01, 3, 0.0 ),
-                   pt( -0.45, 3, -0.8 ),
-                   pt( 0.0, 2.7, 0.0 ),
-                   pt( -0.112, 2.55, -0.2 ) ),
-	    array( pt( 0.0, 3, -0.01 ),
-                   pt( 0.0, 3, -0.8 ),
-                   pt( 0.0, 2.7, 0.0 ),
-                   pt( 0.0, 2.55, -0.2 ) ) ) ),
-    surface( 4, "ec_open", "kv_bezier", 4, "ec_open", "kv_bezier",
-	array(
-	    array( pt( 0.0, 3, -0.01 ),
-                   pt( 0.0, 3, -0.8 ),
-                   pt( 0.0, 2.7, 0.0 ),
-                   pt( 0.0, 2.55, -0.2 ) ),
-	    array( pt( 0.01, 3, 0.0 ),
-                   pt( 0.45, 3, -0.8 ),
-                   pt( 0.0, 2.7, 0.0 ),
-                   pt( 0.112, 2.55, -0.2 ) ),
-	    array( pt( 0.0, 3, -0.01 ),
-                   pt( 0.8, 3, -0.45 ),
-                   pt( 0.0, 2.7, 0.0 ),
-                   pt( 0.2, 2.55, -0.112 ) ),
-	    array( pt( 0.01, 3, 0.0 ),
-                   pt( 0.8, 3, 0.0 ),
-                   pt( 0.0, 2.7, 0.0 ),
-                   pt( 0.2, 2.55, 0.0 ) ) ) ),
-    surface( 4, "ec_open", "kv_bezier", 4, "ec_open", "kv_bezier",
-	array(
-	    array( pt( 0.2, 2.55, 0.0 ),
-                   pt( 0.4, 2.4, 0.0 ),
-                   pt( 1.3, 2.4, 0.0 ),
-                   pt( 1.3, 2.25, 0.0 ) ),
-	    array( pt( 0.2, 2.55, 0.112 ),
-                   pt( 0.4, 2.4, 0.224 ),
-                   pt( 1.3, 2.4, 0.728 ),
-                   pt( 1.3, 2.25, 0.728 ) ),
-	    array( pt( 0.112, 2.55, 0.2 ),
-                   pt( 0.224, 2.4, 0.4 ),
-                   pt( 0.728, 2.4, 1.3 ),
-                   pt( 0.728, 2.25, 1.3 ) ),
-	    array( pt( 0.0, 2.55, 0.2 ),
-                   pt( 0.0, 2.4, 0.4 ),
-                   pt( 0.0, 2.4, 1.3 ),
-                   pt( 0.0, 2.25, 1.3 ) ) ) ),
-    surface( 4, "ec_open", "kv_bezier", 4, "ec_open", "kv_bezier",
-	array(
-	    array( pt( 0.0, 2.55, 0.2 ),
-                   pt( 0.0, 2.4, 0.4 ),
-                   pt( 0.0, 2.4, 1.3 ),
-                   pt( 0.0, 2.25, 1.3 ) ),
-	    array( pt( -0.112, 2.55, 0.2 ),
-                   pt( -0.224, 2.4, 0.4 ),
-                   pt( -0.728, 2.4, 1.3 ),
-                   pt( -0.728, 2.25, 1.3 ) ),
-	    array( pt( -0.2, 2.55, 0.112 ),
-                   pt( -0.4, 2.4, 0.224 ),
-                   pt( -1.3, 2.4, 0.728 ),
-                   pt( -1.3, 2.25, 0.728 ) ),
-	    array( pt( -0.2, 2.55, 0.0 ),
-                   pt( -0.4, 2.4, 0.0 ),
-                   pt( -1.3, 2.4, 0.0 ),
-                   pt( -1.3, 2.25, 0.0 ) ) ) ),
-    surface( 4, "ec_open", "kv_bezier", 4, "ec_open", "kv_bezier",
-	array(
-	    array( pt( -0.2, 2.55, 0.0 ),
-                   pt( -0.4, 2.4, 0.0 ),
-                   pt( -1.3, 2.4, 0.0 ),
-                   pt( -1.3, 2.25, 0.0 ) ),
-	    array( pt( -0.2, 2.55, -0.112 ),
-                   pt( -0.4, 2.4, -0.224 ),
-                   pt( -1.3, 2.4, -0.728 ),
-                   pt( -1.3, 2.25, -0.728 ) ),
-	    array( pt( -0.112, 2.55, -0.2 ),
-                   pt( -0.224, 2.4, -0.4 ),
-                   pt( -0.728, 2.4, -1.3 ),
-                   pt( -0.728, 2.25, -1.3 ) ),
-	    array( pt( 0.0, 2.55, -0.2 ),
-                   pt( 0.0, 2.4, -0.4 ),
-                   pt( 0.0, 2.4, -1.3 ),
-                   pt( 0.0, 2.25, -1.3 ) ) ) ),
-    surface( 4, "ec_open", "kv_bezier", 4, "ec_open", "kv_bezier",
-	array(
-	    array( pt( 0.0, 2.55, -0.2 ),
-                   pt( 0.0, 2.4, -0.4 ),
-                   pt( 0.0, 2.4, -1.3 ),
-                   pt( 0.0, 2.25, -1.3 ) ),
-	    array( pt( 0.112, 2.55, -0.2 ),
-                   pt( 0.224, 2.4, -0.4 ),
-                   pt( 0.728, 2.4, -1.3 ),
-                   pt( 0.728, 2.25, -1.3 ) ),
-	    array( pt( 0.2, 2.55, -0.112 ),
-                   pt( 0.4, 2.4, -0.224 ),
-                   pt( 1.3, 2.4, -0.728 ),
-                   pt( 1.3, 2.25, -0.728 ) ),
-	    array( pt( 0.2, 2.55, 0.0 ),
-                   pt( 0.4, 2.4, 0.0 ),
-                   pt( 1.3, 2.4, 0.0 ),
-                   pt( 1.3, 2.25, 0.0 ) ) ) ) );
-"""
+        yield {**_surface_params(match), "control_points": _to_grid(flat)}
+
+def _shortest_float32(value):
+    # %g drops trailing zeros, so 6 digits also covers shorter decimals, and
+    # 9 significant digits always round-trip a float32.
+    for digits in range(6, 9):
+        candidate = float(f'{value:.{digits}g}')
+        if array('f', (candidate,))[0] == value:
+            return candidate
+    return float(f'{value:.9g}')
+
+def to_json(parsed_data):
+    """
+    Serializes the result of parse_teapot_data() into the "TeaSrfs" JSON format,
+    where every surface carries its own 4x4 grid of [x, y, z] control points.
+
+    Returns UTF-8 encoded bytes. orjson is used when it is installed; otherwise
+    the standard json module writes compact output without indentation.
+    """
+    coords = parsed_data["control_points"]
+    flat = coords.tolist()
+    if coords.itemsize < 8:
+        # Single precision values widen to doubles such as 1.399999976158142;
+        # write them with the shortest decimals that read back as the same float32.
+        flat = [_shortest_float32(value) for value in flat]
+
+    surfaces = [
+        {**params, "control_points": _to_grid(flat, offset)}
+        for params, offset in zip(parsed_data["surface_params"], range(0, len(flat), FLOATS_PER_SURFACE))
+    ]
+
+    data = {"TeaSrfs": surfaces}
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, separators=(',', ':')).encode()
 
 if __name__ == "__main__":
-    # In a real scenario, you would read this from a file:
-    # with open('teapot.txt', 'r') as f:
-    #     teapot_raw_data = f.read()
+    # The data, the cache and the output all live next to this script, so it
+    # can be run from any working directory.
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    output_path = os.path.join(script_dir, 'teapot_data.json')
+
+    # The raw data is kept in teapot.txt instead of being embedded in the source.
+    # It is memory-mapped and parsed as bytes, so it is never copied into a str.
+    with open(os.path.join(script_dir, 'teapot.txt'), 'rb') as f:
+        teapot_raw_data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    # The output is cached on disk under a hash of the data, of this parser's
+    # source and of the JSON serializer in use, so running the script again
+    # with nothing changed skips parsing entirely.
+    key_hash = hashlib.blake2b(teapot_raw_data, digest_size=8)
+    with open(__file__, 'rb') as f:
+        key_hash.update(f.read())
+    key_hash.update(b'orjson' if orjson is not None else b'json')
+    key = key_hash.hexdigest()
+    cache_path = os.path.join(script_dir, f'teapot_data.{key}.json')
 
-    parsed_data = parse_teapot_data(teapot_raw_data)
+    if os.path.exists(cache_path):
+        shutil.copyfile(cache_path, output_path)
+        print(f"Teapot data unchanged, copied cached '{cache_path}' to '{output_path}'")
+    else:
+        parsed_data = parse_teapot_data(teapot_raw_data)
 
-    # Save the parsed data to a JSON file
-    with open('teapot_data.json', 'w') as f:
-        json.dump(parsed_data, f, indent=4)
+        # Save the parsed data to a JSON file
+        with open(cache_path, 'wb') as f:
+            f.write(to_json(parsed_data))
+        shutil.copyfile(cache_path, output_path)
 
-    print("Teapot data parsed and saved to 'teapot_data.json'")
+        print(f"Teapot data parsed and saved to '{output_path}'")
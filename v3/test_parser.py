@@ -0,0 +1,106 @@
+import json
+import logging
+import unittest
+
+from parser import _parse_cached, iter_surfaces, parse_teapot_data, to_json
+
+HEADER = 'surface( 4, "ec_open", "kv_bezier", 4, "ec_open", "kv_bezier",\n'
+
+def _surface(offset=0.0, header=HEADER):
+    rows = ',\n'.join(
+        'array( ' + ', '.join(f'pt( {offset + row}, {col}, 0.5 )' for col in range(4)) + ' )'
+        for row in range(4)
+    )
+    return header + 'array(\n' + rows + ' ) ),\n'
+
+class ParseTeapotDataTest(unittest.TestCase):
+    def setUp(self):
+        logging.getLogger('parser').setLevel(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.getLogger('parser').setLevel(logging.NOTSET)
+
+    def test_valid_surface(self):
+        parsed = parse_teapot_data('TeaSrfs: array(\n' + _surface() + ');\n')
+        self.assertEqual(len(parsed["surface_params"]), 1)
+        self.assertEqual(parsed["control_points"][:3].tolist(), [0.0, 0.0, 0.5])
+
+    def test_float32_json_matches_float64(self):
+        data = 'TeaSrfs: array(\n' + _surface(1.4) + _surface(1.0 / 3) + ');\n'
+        doubles = json.loads(to_json(parse_teapot_data(data)))
+        singles = json.loads(to_json(parse_teapot_data(data, 'f')))
+        self.assertEqual(singles["TeaSrfs"][0], doubles["TeaSrfs"][0])
+        self.assertEqual(singles["TeaSrfs"][1]["control_points"][0][0][0], 0.33333334)
+
+    def test_point_with_wrong_coordinate_count_is_rejected(self):
+        for bad_points in ('pt( 0.0, 1 ), pt( 0.0, 1, 0.5, 7 )',
+                           'pt( 0.0 1, 0.5 ), pt( 0.0, 1, 0.5, 7 )'):
+            surface = _surface().replace('pt( 0.0, 0, 0.5 ), pt( 0.0, 1, 0.5 )', bad_points)
+            data = 'TeaSrfs: array(\n' + surface + _surface(10.0) + ');\n'
+            parsed = parse_teapot_data(data)
+            self.assertEqual(len(parsed["surface_params"]), 1)
+            self.assertEqual(parsed["control_points"][0], 10.0)
+            self.assertEqual(len(list(iter_surfaces(data))), 1)
+
+    def test_damaged_number_is_rejected(self):
+        data = 'TeaSrfs: array(\n' + _surface().replace('pt( 0.0, 0, 0.5 )', 'pt( 0.0a, 0, 0.5 )') + ');\n'
+        self.assertEqual(len(parse_teapot_data(data)["surface_params"]), 0)
+        self.assertEqual(len(list(iter_surfaces(data))), 0)
+
+    def test_bad_number_in_middle_surface_keeps_the_others_aligned(self):
+        cubic_header = 'surface( 3, "ec_open", "kv_bezier", 4, "ec_open", "kv_other",\n'
+        middle = _surface(20.0).replace('pt( 20.0, 2, 0.5 )', 'pt( 20.0, 2.2.2, 0.5 )')
+        data = 'TeaSrfs: array(\n' + _surface(10.0) + middle + _surface(30.0, cubic_header) + ');\n'
+
+        parsed = parse_teapot_data(data)
+        params = parsed["surface_params"]
+        points = parsed["control_points"]
+        self.assertEqual([p["u_degree"] for p in params], [4, 3])
+        self.assertEqual(params[1]["v_basis"], "kv_other")
+        self.assertEqual(len(points), 2 * 48)
+        self.assertEqual(points[0], 10.0)
+        self.assertEqual(points[45], 13.0)
+        self.assertEqual(points[48], 30.0)
+        self.assertEqual(points[48 + 45], 33.0)
+
+        surfaces = list(iter_surfaces(data))
+        self.assertEqual(json.loads(to_json(parsed))["TeaSrfs"], surfaces)
+
+    def test_invalid_typecode_is_rejected(self):
+        with self.assertRaises(ValueError):
+            parse_teapot_data('TeaSrfs: array(\n' + _surface() + ');\n', 'i')
+
+    def test_float32_overflow_is_rejected(self):
+        overflowing = _surface().replace('pt( 0.0, 0, 0.5 )', 'pt( 1e39, 0, 0.5 )')
+        data = 'TeaSrfs: array(\n' + overflowing + _surface(10.0) + ');\n'
+        self.assertEqual(len(parse_teapot_data(data)["surface_params"]), 2)
+        singles = parse_teapot_data(data, 'f')
+        self.assertEqual(len(singles["surface_params"]), 1)
+        self.assertEqual(singles["control_points"][0], 10.0)
+
+    def test_repeated_input_is_parsed_once_and_copied(self):
+        data = 'TeaSrfs: array(\n' + _surface(40.0) + ');\n'
+        _parse_cached.cache_clear()
+        first = parse_teapot_data(data)
+        first["surface_params"][0]["u_degree"] = 99
+        first["control_points"][0] = -1.0
+
+        second = parse_teapot_data(data)
+        self.assertEqual(_parse_cached.cache_info().hits, 1)
+        self.assertEqual(second["surface_params"][0]["u_degree"], 4)
+        self.assertEqual(second["control_points"][0], 40.0)
+
+    def test_non_ascii_comment(self):
+        data = '# café\nTeaSrfs: array(\n' + _surface() + ');\n'
+        self.assertEqual(len(parse_teapot_data(data)["surface_params"]), 1)
+        self.assertEqual(len(list(iter_surfaces(data))), 1)
+
+    def test_surface_without_array_does_not_take_next_points(self):
+        data = 'TeaSrfs: array(\n' + HEADER + '),\n' + _surface(10.0) + ');\n'
+        parsed = parse_teapot_data(data)
+        self.assertEqual(len(parsed["surface_params"]), 1)
+        self.assertEqual(parsed["control_points"][0], 10.0)
+        self.assertEqual(len(list(iter_surfaces(data))), 1)
+
+if __name__ == '__main__':
+    unittest.main()